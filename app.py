@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from databricks import sql
 from databricks.sdk.core import Config
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import os
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import date
 import plotly.graph_objects as go
-import math 
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import Future, ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Testing Automatic Deployment
 
@@ -70,61 +78,192 @@ with st.popover("📖 Info"):
 
 MAIN_SQL_HTTP_PATH = "/sql/1.0/warehouses/472969065f3aed02"
 
+# Stat functions are memoized per filter combination; bound memory by age and count
+STATS_CACHE_TTL = 600  # 10 minutes
+STATS_CACHE_MAX_ENTRIES = 128
+
+# Max number of queries issued concurrently against the warehouse.
+# Also the connection pool size: pool workers and script threads from every session
+# check out from the same pool, so it bounds total warehouse concurrency.
+QUERY_WORKERS = 8
+
 cfg = Config()
 
-@st.cache_resource
-def get_connection() -> Any:
-    """Create and cache a Databricks SQL connection."""
+def open_connection() -> Any:
+    """Open a new Databricks SQL connection."""
     return sql.connect(
         server_hostname=cfg.host,
         http_path=MAIN_SQL_HTTP_PATH,
         credentials_provider=lambda: cfg.authenticate,
     )
 
-def execute_sql_query(query: str) -> List[Any]:
-    """Executes a SQL query with automatic retry on connection failure."""
+class ConnectionPool:
+    """Bounded pool of Databricks SQL connections shared across threads and sessions.
+    
+    Connections are opened lazily up to `size` and reused; a connection that
+    raises while checked out is closed instead of being returned to the pool.
+    """
+    
+    def __init__(self, size: int, connect: Callable[[], Any]):
+        self._connect = connect
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+    
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """Check out a connection, blocking while all `size` connections are in use."""
+        self._slots.acquire()
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            except Exception:
+                self._close(connection)
+                raise
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+    
+    def close_idle(self) -> None:
+        """Close all idle connections so the next checkout opens a fresh one."""
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+    
+    @staticmethod
+    def _close(connection: Any) -> None:
+        try:
+            connection.close()
+        except:
+            pass
+
+@st.cache_resource
+def get_connection_pool() -> ConnectionPool:
+    """Create and cache the Databricks SQL connection pool."""
+    return ConnectionPool(size=QUERY_WORKERS, connect=open_connection)
+
+@st.cache_resource
+def get_query_executor() -> ThreadPoolExecutor:
+    """Create and cache a thread pool for running independent queries concurrently."""
+    return ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="sql-query")
+
+def _execute_with_retry(query: str, fetch: Callable[[Any], Any], params: Optional[Dict[str, Any]] = None) -> Any:
+    """Executes a SQL query with automatic retry on connection failure.
+    
+    `params` are bound to the query's `:name` markers; `fetch` receives the
+    executed cursor and returns the result to hand back.
+    """
     max_retries = 1
     
     for attempt in range(max_retries + 1):
-        cursor = None
+        pool = get_connection_pool()
         try:
-            connection = get_connection()
-            cursor = connection.cursor()
-            cursor.execute(query)
-            result = cursor.fetchall()
-            return result
+            with pool.acquire() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(query, parameters=params)
+                    result = fetch(cursor)
+                    return result
+                finally:
+                    try:
+                        cursor.close()
+                    except:
+                        pass
         except Exception as e:
             if attempt < max_retries:
                 print(f"Database error (Attempt {attempt+1}/{max_retries+1}): {str(e)}. Retrying...")
-                get_connection.clear()
+                pool.close_idle()
             else:
                 raise e
+
+def execute_sql_arrow(query: str, params: Optional[Dict[str, Any]] = None) -> pa.Table:
+    """Executes a SQL query and returns the result as an Arrow table.
+    
+    Avoids materializing Python row tuples; column names come from the result schema.
+    """
+    return _execute_with_retry(query, lambda cursor: cursor.fetchall_arrow(), params)
+
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def run_query(query_text: str, params: Tuple[Tuple[str, Any], ...] = ()) -> pa.Table:
+    """Cached execute_sql_arrow, keyed by query text and bound parameters.
+    
+    Lets individual queries be reused across stat functions and filter changes.
+    """
+    return execute_sql_arrow(query_text, dict(params))
+
+def submit_query(query_text: str, params: Tuple[Tuple[str, Any], ...] = ()) -> Future:
+    """Run run_query on the query executor and return its future.
+    
+    The worker thread borrows the caller's ScriptRunContext for the call, so the
+    st.cache_data lookup doesn't log a missing ScriptRunContext warning.
+    """
+    ctx = get_script_run_ctx()
+    
+    def run_with_context() -> pa.Table:
+        thread = threading.current_thread()
+        add_script_run_ctx(thread, ctx)
+        try:
+            return run_query(query_text, params)
         finally:
-            if cursor:
-                try:
-                    cursor.close()
-                except:
-                    pass
+            add_script_run_ctx(thread, None)
+    
+    return get_query_executor().submit(run_with_context)
+
+def distinct_values(column: pa.ChunkedArray) -> List[str]:
+    """Non-empty values of a column from a per-column GROUPING SETS query.
+    
+    Each grouping set yields a column's distinct values once, with NULL in every
+    other column, and the query orders them, so only nulls and empty strings
+    need dropping.
+    """
+    values = pc.drop_null(column)
+    values = values.filter(pc.not_equal(values, ""))
+    return values.to_pylist()
 
-@st.cache_data(ttl=3600)  # Cache for 1 hour
-def get_filter_options() -> Optional[Dict[str, List[str]]]:
-    """Fetch unique values for all filter fields using pre-calculated tables."""
+@st.cache_data(persist="disk", show_spinner=False)
+def get_filter_options(cache_date: str) -> Optional[Dict[str, List[str]]]:
+    """Fetch unique values for all filter fields using pre-calculated tables.
+    
+    Persisted to disk so server restarts don't pay the warehouse round-trip.
+    Disk-persisted caches ignore `ttl`, so callers pass today's date as
+    `cache_date` to refresh the options once a day.
+    """
     try:
-        # Query 1: Organization filters
-        query_org = """
+        # Single query: distinct values per column from both filter tables in one round-trip.
+        # Each half pads the other table's columns with NULLs so the UNION ALL lines up.
+        # A row only has one non-null column, so ordering by every column (NULLs first)
+        # returns each column's values already sorted.
+        query_filters = """
         SELECT
             region,
             vertical,
             organization,
             industry,
-            account_status
+            account_status,
+            CAST(NULL AS STRING) as vendor,
+            CAST(NULL AS STRING) as device_type_family,
+            CAST(NULL AS STRING) as device_subcategory,
+            CAST(NULL AS STRING) as device_category,
+            CAST(NULL AS STRING) as model,
+            CAST(NULL AS STRING) as os_name,
+            CAST(NULL AS STRING) as mac_oui
         FROM `s3-write-bucket`.sales_dashboard.organization_filters
-        """
-        results_org = execute_sql_query(query_org)
+        GROUP BY GROUPING SETS ((region), (vertical), (organization), (industry), (account_status))
+        
+        UNION ALL
         
-        # Query 2: Device filters
-        query_device = """
         SELECT
+            CAST(NULL AS STRING) as region,
+            CAST(NULL AS STRING) as vertical,
+            CAST(NULL AS STRING) as organization,
+            CAST(NULL AS STRING) as industry,
+            CAST(NULL AS STRING) as account_status,
             vendor,
             device_type_family,
             device_subcategory,
@@ -133,26 +272,35 @@ def get_filter_options() -> Optional[Dict[str, List[str]]]:
             os_name,
             mac_oui
         FROM `s3-write-bucket`.sales_dashboard.device_filters
+        GROUP BY GROUPING SETS (
+            (vendor), (device_type_family), (device_subcategory), (device_category),
+            (model), (os_name), (mac_oui)
+        )
+        
+        ORDER BY
+            region, vertical, organization, industry, account_status,
+            vendor, device_type_family, device_subcategory, device_category,
+            model, os_name, mac_oui
         """
-        results_device = execute_sql_query(query_device)
+        table_filters = execute_sql_arrow(query_filters)
         
         # Extract unique values for each field
         filter_options = {
             # Organization filters
-            'region': sorted(set(r[0] for r in results_org if r[0])),
-            'vertical': sorted(set(r[1] for r in results_org if r[1])),
-            'organization': sorted(set(r[2] for r in results_org if r[2])),
-            'industry': sorted(set(r[3] for r in results_org if r[3])),
-            'account_status': sorted(set(r[4] for r in results_org if r[4])),
+            'region': distinct_values(table_filters.column('region')),
+            'vertical': distinct_values(table_filters.column('vertical')),
+            'organization': distinct_values(table_filters.column('organization')),
+            'industry': distinct_values(table_filters.column('industry')),
+            'account_status': distinct_values(table_filters.column('account_status')),
             
             # Device filters
-            'vendor': sorted(set(r[0] for r in results_device if r[0])),
-            'device_type_family': sorted(set(r[1] for r in results_device if r[1])),
-            'device_subcategory': sorted(set(r[2] for r in results_device if r[2])),
-            'device_category': sorted(set(r[3] for r in results_device if r[3])),
-            'model': sorted(set(r[4] for r in results_device if r[4])),
-            'os_name': sorted(set(r[5] for r in results_device if r[5])),
-            'mac_oui': sorted(set(r[6] for r in results_device if r[6]))
+            'vendor': distinct_values(table_filters.column('vendor')),
+            'device_type_family': distinct_values(table_filters.column('device_type_family')),
+            'device_subcategory': distinct_values(table_filters.column('device_subcategory')),
+            'device_category': distinct_values(table_filters.column('device_category')),
+            'model': distinct_values(table_filters.column('model')),
+            'os_name': distinct_values(table_filters.column('os_name')),
+            'mac_oui': distinct_values(table_filters.column('mac_oui'))
         }
         
         return filter_options
@@ -161,7 +309,92 @@ def get_filter_options() -> Optional[Dict[str, List[str]]]:
         print(f"Error fetching filter options: {str(e)}")
         return None
 
-@st.cache_data
+def build_device_aggregates_query(where_clause: str) -> str:
+    """Build the fused aggregation query over displayable_devices for the Global and Risk tabs.
+    
+    Each row carries its `grouping_set` name and an INT `count`; single-column sets drop
+    NULL keys, Top Devices keeps them. Split the result with split_grouping_sets.
+    """
+    return f"""
+    WITH grouped AS (
+        SELECT 
+            vendor,
+            device_type_family,
+            model,
+            device_subcategory,
+            device_category,
+            os_name,
+            organization,
+            risk_score,
+            CASE
+                WHEN GROUPING(risk_score) = 0 AND GROUPING(model) = 0 THEN concat('risk_', lower(risk_score))
+                WHEN GROUPING(risk_score) = 0 THEN 'risk_dist'
+                WHEN GROUPING(model) = 0 THEN 'top_devices'
+                WHEN GROUPING(device_type_family) = 0 THEN 'top_device_type_family'
+                WHEN GROUPING(device_subcategory) = 0 THEN 'subcategory'
+                WHEN GROUPING(device_category) = 0 THEN 'category'
+                WHEN GROUPING(os_name) = 0 THEN 'os_dist'
+                WHEN GROUPING(vendor) = 0 THEN 'top_vendor'
+                WHEN GROUPING(organization) = 0 THEN 'org_dist'
+                ELSE 'total_devices'
+            END as grouping_set,
+            COUNT(*)::INT as count
+        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
+        WHERE {where_clause}
+        GROUP BY GROUPING SETS (
+            (vendor, device_type_family, model),
+            (device_type_family),
+            (device_subcategory),
+            (device_category),
+            (os_name),
+            (vendor),
+            (organization),
+            (),
+            (risk_score),
+            (risk_score, vendor, device_type_family, model)
+        )
+    ),
+    ranked AS (
+        SELECT 
+            *,
+            ROW_NUMBER() OVER (PARTITION BY grouping_set ORDER BY count DESC) as rn
+        FROM grouped
+        WHERE grouping_set IN ('top_devices', 'total_devices')
+            OR (grouping_set IN ('top_device_type_family', 'subcategory', 'category', 'os_dist', 'top_vendor', 'org_dist')
+                AND COALESCE(device_type_family, device_subcategory, device_category, os_name, vendor, organization) IS NOT NULL)
+            OR (grouping_set = 'risk_dist' AND risk_score IS NOT NULL)
+            OR (grouping_set IN ('risk_critical', 'risk_high', 'risk_medium')
+                AND vendor IS NOT NULL
+                AND device_type_family IS NOT NULL
+                AND model IS NOT NULL)
+    )
+    SELECT *
+    FROM ranked
+    WHERE rn <= CASE grouping_set
+            WHEN 'top_devices' THEN 5000
+            WHEN 'top_device_type_family' THEN 100
+            WHEN 'top_vendor' THEN 100
+            WHEN 'risk_critical' THEN 100
+            WHEN 'risk_high' THEN 100
+            WHEN 'risk_medium' THEN 100
+            ELSE rn
+        END
+    ORDER BY grouping_set, count DESC
+    """
+
+def split_grouping_sets(df: pd.DataFrame, grouping_sets: Dict[str, List[str]]) -> Dict[str, pd.DataFrame]:
+    """Split a GROUPING SETS result into one DataFrame per set.
+    
+    `df` must carry a `grouping_set` name column and a `count` column; each set keeps
+    only its own key columns plus `count`, in the order the rows were returned.
+    """
+    groups = dict(tuple(df.groupby('grouping_set', sort=False)))
+    return {
+        name: groups.get(name, df.iloc[:0])[keys + ['count']].reset_index(drop=True)
+        for name, keys in grouping_sets.items()
+    }
+
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES)
 def get_global_stats(
     region: Optional[str] = None,
     vertical: Optional[str] = None,
@@ -179,132 +412,61 @@ def get_global_stats(
     """Fetch aggregated statistics for the Global tab."""
     try:
         # Build WHERE clause
-        where_clause = build_where_clause(
+        where_clause, where_params = build_where_clause(
             region, vertical, organization, industry, account_status, vendor, device_category,
             device_type_family, device_subcategory, model, os_name, mac_oui
         )
         
-        # Query 1: Top Devices (Aggregated) - Without null filtering
-        # We'll filter nulls in Python to reuse data for multiple tables
-        query_top_devices = f"""
-        SELECT 
-            vendor,
-            device_type_family,
-            model,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-        GROUP BY vendor, device_type_family, model
-        ORDER BY count DESC
-        LIMIT 5000
-        """
-        
-        # Query 2: Device Subcategory Distribution (Aggregated)
-        query_subcategory = f"""
-        SELECT 
-            device_subcategory,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND device_subcategory IS NOT NULL
-        GROUP BY device_subcategory
-        ORDER BY count DESC
-        """
-        
-        # Query 3: Device Category Distribution (Aggregated)
-        query_category = f"""
-        SELECT 
-            device_category,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND device_category IS NOT NULL
-        GROUP BY device_category
-        ORDER BY count DESC
-        """
-        
-        # Query 4: OS Name Distribution (Aggregated)
-        query_os = f"""
-        SELECT 
-            os_name,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND os_name IS NOT NULL
-        GROUP BY os_name
-        ORDER BY count DESC
-        """
-
-        # Query 5: Top 20 Vendors (Aggregated)
-        query_vendor = f"""
-        SELECT 
-            vendor,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND vendor IS NOT NULL
-        GROUP BY vendor
-        ORDER BY count DESC
-        LIMIT 20
-        """
-        
-        # Query 6: Total Device Count
-        query_total = f"""
-        SELECT COUNT(*) as total_count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-        """
+        # Query 1: Device aggregations shared with the Risk tab (see build_device_aggregates_query)
+        query_aggregates = build_device_aggregates_query(where_clause)
         
-        # Query 7: Source Coverage (devices per source from all_seen_sources array)
+        # Query 2: Source Coverage (devices per source from all_seen_sources array)
+        # array_distinct dedupes repeated sources within each device row before exploding,
+        # so no global DISTINCT over (organization, uid, source) is needed
         query_sources = f"""
         SELECT 
             source,
-            COUNT(*) as device_count
+            COUNT(*)::INT as device_count
         FROM (
-            SELECT DISTINCT organization, uid, exploded_source as source
+            SELECT organization, uid, exploded_source as source
             FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-            LATERAL VIEW explode(all_seen_sources) AS exploded_source
+            LATERAL VIEW explode(array_distinct(all_seen_sources)) AS exploded_source
             WHERE {where_clause}
         )
         GROUP BY source
         ORDER BY device_count DESC
         """
         
-        # Query 8: Organization Distribution (all organizations, for CSV download)
-        query_org_dist = f"""
-        SELECT 
-            organization,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND organization IS NOT NULL
-        GROUP BY organization
-        ORDER BY count DESC
-        """
-        
-        results_top = execute_sql_query(query_top_devices)
-        df_top = pd.DataFrame(results_top, columns=['vendor', 'device_type_family', 'model', 'count'])
-        
-        results_sub = execute_sql_query(query_subcategory)
-        df_sub = pd.DataFrame(results_sub, columns=['device_subcategory', 'count'])
-        
-        results_cat = execute_sql_query(query_category)
-        df_cat = pd.DataFrame(results_cat, columns=['device_category', 'count'])
+        # The two queries are independent and latency-bound, so run them concurrently.
+        # Create the cached connection pool first so workers don't race to create it.
+        get_connection_pool()
+        future_aggregates = submit_query(query_aggregates, where_params)
+        future_sources = submit_query(query_sources, where_params)
         
-        results_os = execute_sql_query(query_os)
-        df_os = pd.DataFrame(results_os, columns=['os_name', 'count'])
-
-        results_vendor = execute_sql_query(query_vendor)
-        df_vendor = pd.DataFrame(results_vendor, columns=['vendor', 'count'])
-        
-        results_total = execute_sql_query(query_total)
-        total_devices = results_total[0][0] if results_total else 0
+        df_aggregates = future_aggregates.result().to_pandas(types_mapper=pd.ArrowDtype)
+        aggregates = split_grouping_sets(df_aggregates, {
+            "top_devices": ['vendor', 'device_type_family', 'model'],
+            "subcategory": ['device_subcategory'],
+            "category": ['device_category'],
+            "os_dist": ['os_name'],
+            "top_device_type_family": ['device_type_family'],
+            "top_vendor": ['vendor'],
+            "org_dist": ['organization'],
+            "total_devices": []
+        })
+        df_top = aggregates["top_devices"]
+        df_sub = aggregates["subcategory"]
+        df_cat = aggregates["category"]
+        df_os = aggregates["os_dist"]
+        df_dtype_counts = aggregates["top_device_type_family"]
+        df_vendor_counts = aggregates["top_vendor"]
+        # Top 20 vendors for the pie chart are the head of the Top 100 vendors table
+        df_vendor = df_vendor_counts.head(20)
+        df_org_dist = aggregates["org_dist"]
+        df_total = aggregates["total_devices"]
+        total_devices = int(df_total['count'].iloc[0]) if not df_total.empty else 0
         
-        results_sources = execute_sql_query(query_sources)
-        df_sources = pd.DataFrame(results_sources, columns=['source', 'device_count'])
-        
-        results_org_dist = execute_sql_query(query_org_dist)
-        df_org_dist = pd.DataFrame(results_org_dist, columns=['organization', 'count'])
+        df_sources = future_sources.result().to_pandas(types_mapper=pd.ArrowDtype)
         
         return {
             "top_devices": df_top,
@@ -312,6 +474,8 @@ def get_global_stats(
             "category": df_cat,
             "os_dist": df_os,
             "vendor_dist": df_vendor,
+            "top_device_type_family": df_dtype_counts,
+            "top_vendor": df_vendor_counts,
             "total_devices": total_devices,
             "source_coverage": df_sources,
             "org_dist": df_org_dist
@@ -325,12 +489,14 @@ def get_global_stats(
             "category": pd.DataFrame(),
             "os_dist": pd.DataFrame(),
             "vendor_dist": pd.DataFrame(),
+            "top_device_type_family": pd.DataFrame(),
+            "top_vendor": pd.DataFrame(),
             "total_devices": 0,
             "source_coverage": pd.DataFrame(),
             "org_dist": pd.DataFrame()
         }
 
-@st.cache_data
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES)
 def get_risk_stats(
     region: Optional[str] = None,
     vertical: Optional[str] = None,
@@ -348,88 +514,24 @@ def get_risk_stats(
     """Fetch aggregated statistics for the Risk tab."""
     try:
         # Build WHERE clause
-        where_clause = build_where_clause(
+        where_clause, where_params = build_where_clause(
             region, vertical, organization, industry, account_status, vendor, device_category,
             device_type_family, device_subcategory, model, os_name, mac_oui
         )
         
-        # Query 4: Risk Score Distribution
-        query_risk_dist = f"""
-        SELECT 
-            risk_score,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND risk_score IS NOT NULL
-        GROUP BY risk_score
-        ORDER BY count DESC
-        """
-        
-        # Query 5: Top Devices by Risk Score (Critical)
-        query_risk_critical = f"""
-        SELECT 
-            vendor,
-            device_type_family,
-            model,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND risk_score = 'Critical'
-            AND vendor IS NOT NULL 
-            AND device_type_family IS NOT NULL 
-            AND model IS NOT NULL
-        GROUP BY vendor, device_type_family, model
-        ORDER BY count DESC
-        LIMIT 100
-        """
-        
-        # Query 6: Top Devices by Risk Score (High)
-        query_risk_high = f"""
-        SELECT 
-            vendor,
-            device_type_family,
-            model,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND risk_score = 'High'
-            AND vendor IS NOT NULL 
-            AND device_type_family IS NOT NULL 
-            AND model IS NOT NULL
-        GROUP BY vendor, device_type_family, model
-        ORDER BY count DESC
-        LIMIT 100
-        """
-        
-        # Query 7: Top Devices by Risk Score (Medium)
-        query_risk_medium = f"""
-        SELECT 
-            vendor,
-            device_type_family,
-            model,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices
-        WHERE {where_clause}
-            AND risk_score = 'Medium'
-            AND vendor IS NOT NULL 
-            AND device_type_family IS NOT NULL 
-            AND model IS NOT NULL
-        GROUP BY vendor, device_type_family, model
-        ORDER BY count DESC
-        LIMIT 100
-        """
-        
-        results_risk = execute_sql_query(query_risk_dist)
-        df_risk = pd.DataFrame(results_risk, columns=['risk_score', 'count'])
-        
-        results_critical = execute_sql_query(query_risk_critical)
-        df_critical = pd.DataFrame(results_critical, columns=['vendor', 'device_type_family', 'model', 'count'])
-        
-        results_high = execute_sql_query(query_risk_high)
-        df_high = pd.DataFrame(results_high, columns=['vendor', 'device_type_family', 'model', 'count'])
-        
-        results_medium = execute_sql_query(query_risk_medium)
-        df_medium = pd.DataFrame(results_medium, columns=['vendor', 'device_type_family', 'model', 'count'])
+        # Same fused query as get_global_stats, so this is normally a run_query cache hit
+        query_aggregates = build_device_aggregates_query(where_clause)
+        df_aggregates = run_query(query_aggregates, where_params).to_pandas(types_mapper=pd.ArrowDtype)
+        aggregates = split_grouping_sets(df_aggregates, {
+            "risk_dist": ['risk_score'],
+            "risk_critical": ['vendor', 'device_type_family', 'model'],
+            "risk_high": ['vendor', 'device_type_family', 'model'],
+            "risk_medium": ['vendor', 'device_type_family', 'model']
+        })
+        df_risk = aggregates["risk_dist"]
+        df_critical = aggregates["risk_critical"]
+        df_high = aggregates["risk_high"]
+        df_medium = aggregates["risk_medium"]
         
         return {
             "risk_dist": df_risk,
@@ -447,7 +549,7 @@ def get_risk_stats(
             "risk_medium": pd.DataFrame()
         }
 
-@st.cache_data
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES)
 def get_vulnerability_stats(
     region: Optional[str] = None,
     vertical: Optional[str] = None,
@@ -465,45 +567,58 @@ def get_vulnerability_stats(
     """Fetch aggregated statistics for the Vulnerabilities tab.
     
     Queries the denormalized vulnerability table directly (no JOIN needed).
-    Uses LATERAL VIEW EXPLODE to unnest vulnerability arrays.
-    Splits Confirmed vs Potentially Relevant in pandas for efficiency.
+    Uses LATERAL VIEW EXPLODE to unnest vulnerability arrays and returns only the
+    top 100 advisories per relevance, with per-relevance totals.
+    Splits Confirmed vs Potentially Relevant with a single pandas groupby.
     """
     try:
         # Build WHERE clause - applies directly to vulnerability table (has all filter fields)
-        where_clause = build_where_clause(
+        where_clause, where_params = build_where_clause(
             region, vertical, organization, industry, account_status, vendor, device_category,
             device_type_family, device_subcategory, model, os_name, mac_oui
         )
         
         # Single query: Filter by device attributes, EXPLODE array, aggregate by relevance + vuln
         # No JOIN needed - table already contains all filter fields
+        # Only the top 100 per relevance are displayed, so keep just those (QUALIFY) and
+        # carry each relevance's full total alongside them as a window sum.
         query_vuln = f"""
         SELECT 
             effective_relevance,
-            v.name as advisory_name,
-            v.source_name,
-            COUNT(*) as count
-        FROM `s3-write-bucket`.sales_dashboard.displayable_devices_vulnerabilities
-        LATERAL VIEW EXPLODE(vulnerabilities_list) exploded AS v
-        WHERE {where_clause}
-        GROUP BY effective_relevance, v.name, v.source_name
+            advisory_name,
+            source_name,
+            count,
+            SUM(count) OVER (PARTITION BY effective_relevance) as relevance_total
+        FROM (
+            SELECT 
+                effective_relevance,
+                v.name as advisory_name,
+                v.source_name,
+                COUNT(*) as count
+            FROM `s3-write-bucket`.sales_dashboard.displayable_devices_vulnerabilities
+            LATERAL VIEW EXPLODE(vulnerabilities_list) exploded AS v
+            WHERE {where_clause}
+                AND effective_relevance IN ('Confirmed', 'Potentially Relevant')
+            GROUP BY effective_relevance, v.name, v.source_name
+        )
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY effective_relevance ORDER BY count DESC) <= 100
         ORDER BY effective_relevance, count DESC
         """
         
-        results = execute_sql_query(query_vuln)
-        df_all = pd.DataFrame(results, columns=['effective_relevance', 'advisory_name', 'source_name', 'count'])
+        df_all = run_query(query_vuln, where_params).to_pandas(types_mapper=pd.ArrowDtype)
         
-        # Split results by effective_relevance in pandas
-        df_confirmed_all = df_all[df_all['effective_relevance'] == 'Confirmed'].copy()
-        df_potential_all = df_all[df_all['effective_relevance'] == 'Potentially Relevant'].copy()
+        # Split results by effective_relevance in pandas (one groupby pass, no mask copies)
+        groups = dict(tuple(df_all.groupby('effective_relevance', sort=False)))
+        df_confirmed_all = groups.get('Confirmed', df_all.iloc[:0])
+        df_potential_all = groups.get('Potentially Relevant', df_all.iloc[:0])
         
-        # Calculate totals (sum of all counts per category)
-        total_confirmed = int(df_confirmed_all['count'].sum()) if not df_confirmed_all.empty else 0
-        total_potential = int(df_potential_all['count'].sum()) if not df_potential_all.empty else 0
+        # Totals (sum of all counts per category, including rows beyond the top 100)
+        total_confirmed = int(df_confirmed_all['relevance_total'].iloc[0]) if not df_confirmed_all.empty else 0
+        total_potential = int(df_potential_all['relevance_total'].iloc[0]) if not df_potential_all.empty else 0
         
         # Get top 100 for display
-        df_confirmed = df_confirmed_all[['advisory_name', 'source_name', 'count']].head(100).reset_index(drop=True)
-        df_potential = df_potential_all[['advisory_name', 'source_name', 'count']].head(100).reset_index(drop=True)
+        df_confirmed = df_confirmed_all.iloc[:100][['advisory_name', 'source_name', 'count']].reset_index(drop=True)
+        df_potential = df_potential_all.iloc[:100][['advisory_name', 'source_name', 'count']].reset_index(drop=True)
         
         return {
             "vuln_confirmed": df_confirmed,
@@ -525,78 +640,61 @@ def build_where_clause(
     region, vertical, organization, industry, account_status, vendor, device_category,
     device_type_family, device_subcategory, model, os_name, mac_oui
 ):
-    """Helper to build WHERE clause for stat functions."""
-    def escape_sql_string(value: str) -> str:
-        if value is None: return ""
-        return str(value).replace("'", "''")
+    """Helper to build WHERE clause for stat functions.
     
-    where_conditions = []
-    
-    if region is not None:
-        where_conditions.append(f"region = '{escape_sql_string(region)}'")
-    if vertical is not None:
-        where_conditions.append(f"vertical = '{escape_sql_string(vertical)}'")
-    if organization is not None:
-        where_conditions.append(f"organization = '{escape_sql_string(organization)}'")
-    if industry is not None:
-        where_conditions.append(f"industry = '{escape_sql_string(industry)}'")
-    if account_status is not None:
-        where_conditions.append(f"account_status = '{escape_sql_string(account_status)}'")
-    if vendor is not None:
-        where_conditions.append(f"vendor = '{escape_sql_string(vendor)}'")
-    if device_category is not None:
-        where_conditions.append(f"device_category = '{escape_sql_string(device_category)}'")
-    if device_type_family is not None:
-        where_conditions.append(f"device_type_family = '{escape_sql_string(device_type_family)}'")
-    if device_subcategory is not None:
-        where_conditions.append(f"device_subcategory = '{escape_sql_string(device_subcategory)}'")
-    if model is not None:
-        where_conditions.append(f"model = '{escape_sql_string(model)}'")
-    if os_name is not None:
-        where_conditions.append(f"os_name = '{escape_sql_string(os_name)}'")
-    if mac_oui is not None:
-        where_conditions.append(f"array_contains(mac_oui_list, '{escape_sql_string(mac_oui)}')")
-    
-    return " AND ".join(where_conditions) if where_conditions else "1=1"
+    Returns the clause with `:name` parameter markers and the parameters to bind
+    as `(name, value)` pairs, so the query text only depends on which filters are
+    set, not their values.
+    """
+    return build_where_clause_with_alias(
+        region, vertical, organization, industry, account_status, vendor, device_category,
+        device_type_family, device_subcategory, model, os_name, mac_oui, alias=None
+    )
 
 def build_where_clause_with_alias(
     region, vertical, organization, industry, account_status, vendor, device_category,
     device_type_family, device_subcategory, model, os_name, mac_oui, alias='d'
 ):
-    """Helper to build WHERE clause with table alias for JOIN queries."""
-    def escape_sql_string(value: str) -> str:
-        if value is None: return ""
-        return str(value).replace("'", "''")
+    """Helper to build WHERE clause with table alias for JOIN queries.
     
-    where_conditions = []
+    Returns `(where_sql, params)`; see build_where_clause.
+    """
+    params = tuple(
+        (name, value)
+        for name, value in [
+            ('region', region),
+            ('vertical', vertical),
+            ('organization', organization),
+            ('industry', industry),
+            ('account_status', account_status),
+            ('vendor', vendor),
+            ('device_category', device_category),
+            ('device_type_family', device_type_family),
+            ('device_subcategory', device_subcategory),
+            ('model', model),
+            ('os_name', os_name),
+            ('mac_oui', mac_oui),
+        ]
+        if value is not None
+    )
     
-    if region is not None:
-        where_conditions.append(f"{alias}.region = '{escape_sql_string(region)}'")
-    if vertical is not None:
-        where_conditions.append(f"{alias}.vertical = '{escape_sql_string(vertical)}'")
-    if organization is not None:
-        where_conditions.append(f"{alias}.organization = '{escape_sql_string(organization)}'")
-    if industry is not None:
-        where_conditions.append(f"{alias}.industry = '{escape_sql_string(industry)}'")
-    if account_status is not None:
-        where_conditions.append(f"{alias}.account_status = '{escape_sql_string(account_status)}'")
-    if vendor is not None:
-        where_conditions.append(f"{alias}.vendor = '{escape_sql_string(vendor)}'")
-    if device_category is not None:
-        where_conditions.append(f"{alias}.device_category = '{escape_sql_string(device_category)}'")
-    if device_type_family is not None:
-        where_conditions.append(f"{alias}.device_type_family = '{escape_sql_string(device_type_family)}'")
-    if device_subcategory is not None:
-        where_conditions.append(f"{alias}.device_subcategory = '{escape_sql_string(device_subcategory)}'")
-    if model is not None:
-        where_conditions.append(f"{alias}.model = '{escape_sql_string(model)}'")
-    if os_name is not None:
-        where_conditions.append(f"{alias}.os_name = '{escape_sql_string(os_name)}'")
-    if mac_oui is not None:
-        where_conditions.append(f"array_contains({alias}.mac_oui_list, '{escape_sql_string(mac_oui)}')")
+    active_keys = tuple(name for name, _ in params)
+    return where_clause_template(active_keys, alias), params
+
+def where_clause_template(active_keys: Tuple[str, ...], alias: Optional[str]) -> str:
+    """WHERE clause with `:name` markers for a set of active filters.
     
+    The text only depends on which filters are set (and the alias), never on their values.
+    """
+    prefix = f"{alias}." if alias else ""
+    where_conditions = [
+        f"array_contains({prefix}mac_oui_list, :mac_oui)" if name == 'mac_oui'
+        else f"{prefix}{name} = :{name}"
+        for name in active_keys
+    ]
     return " AND ".join(where_conditions) if where_conditions else "1=1"
 
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES)
 def get_uid_examples(
     region: Optional[str] = None,
     vertical: Optional[str] = None,
@@ -617,7 +715,7 @@ def get_uid_examples(
     vendor, model, device_type_family, serial_number, sw_version, hw_version, product_code
     """
     try:
-        where_clause = build_where_clause(
+        where_clause, where_params = build_where_clause(
             region, vertical, organization, industry, account_status, vendor, device_category,
             device_type_family, device_subcategory, model, os_name, mac_oui
         )
@@ -634,291 +732,239 @@ def get_uid_examples(
             sw_version,
             hw_version,
             product_code,
-            (CASE WHEN vendor IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN model IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN device_type_family IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN serial_number IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN sw_version IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN hw_version IS NOT NULL THEN 1 ELSE 0 END +
-             CASE WHEN product_code IS NOT NULL THEN 1 ELSE 0 END) as classification_score
+            ((vendor IS NOT NULL)::INT +
+             (model IS NOT NULL)::INT +
+             (device_type_family IS NOT NULL)::INT +
+             (serial_number IS NOT NULL)::INT +
+             (sw_version IS NOT NULL)::INT +
+             (hw_version IS NOT NULL)::INT +
+             (product_code IS NOT NULL)::INT) as classification_score
         FROM `s3-write-bucket`.sales_dashboard.displayable_devices
         WHERE {where_clause}
         ORDER BY classification_score DESC, organization, uid
         LIMIT 50
         """
         
-        results = execute_sql_query(query)
-        df = pd.DataFrame(results, columns=[
-            'organization', 'uid', 'vendor', 'model', 'device_type_family',
-            'serial_number', 'sw_version', 'hw_version', 'product_code', 'classification_score'
-        ])
+        df = run_query(query, where_params).to_pandas(types_mapper=pd.ArrowDtype)
         return df
         
     except Exception as e:
         st.error(f"Error fetching UID examples: {str(e)}")
         return pd.DataFrame()
 
-# Sidebar filters
-st.sidebar.header("Filters")
-
-# Create a placeholder for filter errors that we can clear later
-filter_error_container = st.sidebar.empty()
-
-# Get filter options
-filter_options_result = get_filter_options()
-
-if filter_options_result is None:
-    # Show error if failed
-    filter_error_container.error("⚠️ Filter options failed to load. Using defaults.")
-    filter_options = {key: [] for key in [
-        'region', 'vertical', 'organization', 'industry', 
-        'vendor', 'device_category', 'device_type_family', 
-        'device_subcategory', 'model', 'os_name', 'mac_oui'
-    ]}
-else:
-    # Clear any previous error if successful
-    filter_error_container.empty()
-    filter_options = filter_options_result
+@st.cache_data(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def dataframe_to_csv(df: pd.DataFrame) -> bytes:
+    """CSV bytes for a download button, cached so reruns don't re-serialize the same frame."""
+    return df.to_csv(index=False).encode()
 
-# Use a form to batch filter changes - form only triggers rerun on submit
-with st.sidebar.form("filters_form"):
-    # Submit button at the top
-    submitted = st.form_submit_button("🔄 Apply Filters & Refresh", use_container_width=True)
-    
-    st.subheader("Organization Filters")
-    # Create filter dropdowns inside the form
-    selected_region = st.selectbox(
-        "Region",
-        options=[None] + filter_options.get('region', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+@st.cache_resource(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_pie_figure(
+    df: pd.DataFrame,
+    label_column: str,
+    hole: float = 0.3,
+    height: int = 400,
+    margin: Tuple[int, int, int, int] = (20, 20, 30, 20),
+    colors: Optional[Tuple[str, ...]] = None
+) -> go.Figure:
+    """Donut chart of df['count'] by `label_column`; margin is (l, r, t, b).
     
-    selected_vertical = st.selectbox(
-        "Vertical",
-        options=[None] + filter_options.get('vertical', []),
-        format_func=lambda x: "All" if x is None else x
+    Cached per dataframe so reruns from buttons inside the dashboard reuse the figure.
+    """
+    fig = go.Figure(data=[go.Pie(
+        labels=df[label_column].tolist(),
+        values=df['count'].tolist(),
+        hole=hole,
+        marker=dict(colors=list(colors)) if colors else None
+    )])
+    left, right, top, bottom = margin
+    fig.update_layout(
+        height=height,
+        showlegend=True,
+        margin=dict(l=left, r=right, t=top, b=bottom)
     )
+    return fig
+
+def rainbow_palette(num_colors: int) -> List[str]:
+    """`num_colors` evenly spaced soft HSL colors."""
+    return [
+        f'hsl({int(i * 360 / num_colors)}, 55%, 45%)' 
+        for i in range(num_colors)
+    ]
+
+@st.cache_resource(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_sources_figure(df_sources: pd.DataFrame, total_devices: int) -> go.Figure:
+    """Horizontal bar chart of the share of devices reporting each source."""
+    # Calculate percentage of devices that have each source, sorted ascending
+    # (largest bar on top) with a single argsort over the plain arrays
+    device_counts = df_sources['device_count'].to_numpy(dtype=np.int64)
+    percentages = (device_counts / total_devices * 100).round(1)
+    order = np.argsort(percentages, kind='stable')
+    percentages = percentages[order]
+    device_counts = device_counts[order]
+    sources = df_sources['source'].to_numpy(dtype=object)[order]
     
-    selected_organization = st.selectbox(
-        "Organization",
-        options=[None] + filter_options.get('organization', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+    # Assign distinct colors to each bar (softer rainbow)
+    num_sources = len(sources)
+    colors = rainbow_palette(num_sources)
     
-    selected_industry = st.selectbox(
-        "Industry",
-        options=[None] + filter_options.get('industry', []),
-        format_func=lambda x: "All" if x is None else x
+    fig_sources = go.Figure(go.Bar(
+        x=percentages,
+        y=sources,
+        orientation='h',
+        text=(
+            pd.Series(percentages).astype(str) + '% ('
+            + pd.Series(device_counts).map('{:,}'.format) + ' devices)'
+        ).tolist(),
+        textposition='auto',
+        marker=dict(
+            color=colors,
+            line=dict(color='white', width=1)
+        )
+    ))
+    fig_sources.update_layout(
+        xaxis_title="% of Devices",
+        yaxis_title="",
+        height=max(300, num_sources * 50),  # Dynamic height based on number of sources
+        margin=dict(l=0, r=0, t=20, b=40),
+        xaxis=dict(range=[0, 105]),  # Allow some room for 100%+ labels
+        yaxis=dict(tickfont=dict(size=14))  # Larger font for source labels
     )
+    return fig_sources
+
+@st.cache_resource(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_os_bubble_figure(df_os: pd.DataFrame) -> go.Figure:
+    """Packed bubble chart of the OS distribution, largest OS in the centre."""
+    # Prepare data for spiral layout
+    df_bubble = df_os.copy()
+    df_bubble = df_bubble.sort_values('count', ascending=False).reset_index(drop=True)
     
-    selected_account_status = st.selectbox(
-        "Account Status",
-        options=[None] + filter_options.get('account_status', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+    # Calculate percentages
+    total_count = df_bubble['count'].sum()
+    df_bubble['percent'] = (df_bubble['count'] / total_count * 100).round(1)
     
-    st.markdown("---")
-    st.subheader("Device Filters")
+    # Spiral Coordinates Algorithm
+    # This places the largest bubble in center (0,0) and spirals others out
+    i = np.arange(len(df_bubble))
+    angle = 2.4 * i  # Golden angle approximation (radians)
+    radius = 7 * np.sqrt(i)  # Spread factor
+    x_coords = radius * np.cos(angle)
+    y_coords = radius * np.sin(angle)
     
-    selected_device_category = st.selectbox(
-        "Device Category",
-        options=[None] + filter_options.get('device_category', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+    # Boost small sizes for visibility (Logarithmic scaling for visualization)
+    # This ensures small counts are visible bubbles, while large ones are still dominant
+    # log1p keeps zero-safe ordering; +1 gives the smallest bubbles a floor size
+    visual_sizes = np.log1p(df_bubble['count'].to_numpy(dtype=float)) + 1.0
     
-    selected_device_subcategory = st.selectbox(
-        "Device Subcategory",
-        options=[None] + filter_options.get('device_subcategory', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+    # Bubble labels built with vectorized string concatenation
+    os_names = df_bubble['os_name'].astype(str)
+    percents = df_bubble['percent'].astype(str)
+    bubble_text = (os_names + '<br>' + percents + '%').tolist()
+    bubble_hovertext = (os_names + ': ' + df_bubble['count'].astype(str) + ' (' + percents + '%)').tolist()
     
-    selected_device_type_family = st.selectbox(
-        "Device Type Family",
-        options=[None] + filter_options.get('device_type_family', []),
-        format_func=lambda x: "All" if x is None else x
-    )
-    
-    selected_vendor = st.selectbox(
-        "Vendor",
-        options=[None] + filter_options.get('vendor', []),
-        format_func=lambda x: "All" if x is None else x
-    )
+    fig_bubble = go.Figure(go.Scatter(
+        x=x_coords,
+        y=y_coords,
+        mode='markers+text',
+        marker=dict(
+            size=visual_sizes,
+            sizemode='area',
+            # Larger sizeref = smaller bubbles. We lower it to make bubbles bigger.
+            sizeref=2.0 * visual_sizes.max() / (120**2), 
+            color=df_bubble.index, # Use Index (Integers) for colorscale
+            colorscale='Turbo', # Vibrant, varied scale
+            showscale=False
+        ),
+        text=bubble_text,
+        textposition="middle center",
+        textfont=dict(color='white', size=10, weight='bold'), # Ensure text is readable
+        hoverinfo='text',
+        hovertext=bubble_hovertext
+    ))
     
-    selected_model = st.selectbox(
-        "Model",
-        options=[None] + filter_options.get('model', []),
-        format_func=lambda x: "All" if x is None else x
+    fig_bubble.update_layout(
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        height=600,
+        margin=dict(l=0, r=0, t=20, b=0),
+        plot_bgcolor='rgba(0,0,0,0)'
     )
-    
-    selected_os_name = st.selectbox(
-        "OS Name",
-        options=[None] + filter_options.get('os_name', []),
-        format_func=lambda x: "All" if x is None else x
-    )
-    
-    selected_mac_oui = st.selectbox(
-        "MAC OUI",
-        options=[None] + filter_options.get('mac_oui', []),
-        format_func=lambda x: "All" if x is None else x
-    )
-
-# Initialize session state to store last query result
-if 'last_stats' not in st.session_state:
-    st.session_state.last_stats = {
-        "top_devices": pd.DataFrame(), 
-        "subcategory": pd.DataFrame(),
-        "category": pd.DataFrame(),
-        "os_dist": pd.DataFrame(),
-        "vendor_dist": pd.DataFrame(),
-        "total_devices": 0,
-        "source_coverage": pd.DataFrame(),
-        "org_dist": pd.DataFrame(),
-        "risk_dist": pd.DataFrame(),
-        "risk_critical": pd.DataFrame(),
-        "risk_high": pd.DataFrame(),
-        "risk_medium": pd.DataFrame(),
-        "vuln_confirmed": pd.DataFrame(),
-        "vuln_potential": pd.DataFrame(),
-        "vuln_confirmed_total": 0,
-        "vuln_potential_total": 0
-    }
-if 'last_filters' not in st.session_state:
-    st.session_state.last_filters = {}
-if 'initial_load_done' not in st.session_state:
-    st.session_state.initial_load_done = False
-if 'vuln_needs_refresh' not in st.session_state:
-    st.session_state.vuln_needs_refresh = True
+    return fig_bubble
 
-# Auto-load on first run when all filters are "All" (None)
-all_filters_all = (
-    selected_region is None and
-    selected_vertical is None and
-    selected_organization is None and
-    selected_industry is None and
-    selected_account_status is None and
-    selected_vendor is None and
-    selected_device_category is None and
-    selected_device_type_family is None and
-    selected_device_subcategory is None and
-    selected_model is None and
-    selected_os_name is None and
-    selected_mac_oui is None
-)
-
-# Query on form submit OR on initial load when all filters are "All"
-should_query = submitted or (not st.session_state.initial_load_done and all_filters_all)
-
-if should_query:
-    # Store current filter values
-    current_filters = {
-        'region': selected_region,
-        'vertical': selected_vertical,
-        'organization': selected_organization,
-        'industry': selected_industry,
-        'account_status': selected_account_status,
-        'vendor': selected_vendor,
-        'device_category': selected_device_category,
-        'device_type_family': selected_device_type_family,
-        'device_subcategory': selected_device_subcategory,
-        'model': selected_model,
-        'os_name': selected_os_name,
-        'mac_oui': selected_mac_oui
-    }
-    st.session_state.last_filters = current_filters
+@st.cache_resource(ttl=STATS_CACHE_TTL, max_entries=STATS_CACHE_MAX_ENTRIES, show_spinner=False)
+def build_lollipop_figure(df_org_dist: pd.DataFrame) -> go.Figure:
+    """Lollipop chart of the 20 organizations with the most devices."""
+    # Get top 20 for display
+    df_org_top20 = df_org_dist.head(20).copy()
+    df_org_top20 = df_org_top20.sort_values('count', ascending=True)  # For horizontal chart
     
-    # Mark initial load as done
-    if not st.session_state.initial_load_done:
-        st.session_state.initial_load_done = True
+    # Create lollipop chart (scatter + line segments)
+    fig_lollipop = go.Figure()
     
-    # Update state with Global stats
-    with st.spinner("Loading Global data..."):
-        stats_global = get_global_stats(
-            region=selected_region,
-            vertical=selected_vertical,
-            organization=selected_organization,
-            industry=selected_industry,
-            account_status=selected_account_status,
-            vendor=selected_vendor,
-            device_category=selected_device_category,
-            device_type_family=selected_device_type_family,
-            device_subcategory=selected_device_subcategory,
-            model=selected_model,
-            os_name=selected_os_name,
-            mac_oui=selected_mac_oui
-        )
-        st.session_state.last_stats.update(stats_global)
+    # Add lines (stems) - one trace, with a gap point separating each 0 -> count segment
+    num_orgs = len(df_org_top20)
+    stem_x = np.empty(3 * num_orgs)
+    stem_x[0::3] = 0
+    stem_x[1::3] = df_org_top20['count'].to_numpy(dtype=float)
+    stem_x[2::3] = np.nan
+    stem_y = np.empty(3 * num_orgs, dtype=object)
+    stem_y[0::3] = df_org_top20['organization'].to_numpy(dtype=object)
+    stem_y[1::3] = stem_y[0::3]
+    stem_y[2::3] = None
+    fig_lollipop.add_trace(go.Scatter(
+        x=stem_x,
+        y=stem_y,
+        mode='lines',
+        connectgaps=False,
+        line=dict(color='#3f51b5', width=2),
+        showlegend=False
+    ))
     
-    # Update state with Risk stats (runs after Global is done)
-    with st.spinner("Loading Risk data..."):
-        stats_risk = get_risk_stats(
-            region=selected_region,
-            vertical=selected_vertical,
-            organization=selected_organization,
-            industry=selected_industry,
-            account_status=selected_account_status,
-            vendor=selected_vendor,
-            device_category=selected_device_category,
-            device_type_family=selected_device_type_family,
-            device_subcategory=selected_device_subcategory,
-            model=selected_model,
-            os_name=selected_os_name,
-            mac_oui=selected_mac_oui
-        )
-        st.session_state.last_stats.update(stats_risk)
+    # Add dots (lollipop heads)
+    fig_lollipop.add_trace(go.Scatter(
+        x=df_org_top20['count'],
+        y=df_org_top20['organization'],
+        mode='markers+text',
+        marker=dict(size=12, color='#3f51b5'),
+        text=df_org_top20['count'].apply(lambda x: f'{x:,}'),
+        textposition='middle right',
+        textfont=dict(size=11),
+        showlegend=False
+    ))
     
-    # Mark vulnerability data as needing refresh (will load lazily when tab is viewed)
-    st.session_state.vuln_needs_refresh = True
-
-# Get current stats (either newly fetched or from last run)
-stats = st.session_state.last_stats
-df_top = stats.get("top_devices", pd.DataFrame())
-df_sub = stats.get("subcategory", pd.DataFrame())
-df_cat = stats.get("category", pd.DataFrame())
-df_os = stats.get("os_dist", pd.DataFrame())
-df_vendor = stats.get("vendor_dist", pd.DataFrame())
-total_devices = stats.get("total_devices", 0)
-df_sources = stats.get("source_coverage", pd.DataFrame())
-df_org_dist = stats.get("org_dist", pd.DataFrame())
-df_risk = stats.get("risk_dist", pd.DataFrame())
-df_critical = stats.get("risk_critical", pd.DataFrame())
-df_high = stats.get("risk_high", pd.DataFrame())
-df_medium = stats.get("risk_medium", pd.DataFrame())
-# Note: Vulnerability data is loaded lazily in the Vulnerabilities tab
-
-# Show data status (based on Global stats)
-data_loaded = not df_top.empty or not df_sub.empty or not df_cat.empty
+    fig_lollipop.update_layout(
+        height=max(400, len(df_org_top20) * 30),
+        margin=dict(l=0, r=60, t=20, b=40),
+        xaxis_title="Device Count",
+        yaxis_title="",
+        yaxis=dict(tickfont=dict(size=12)),
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig_lollipop
 
-if not data_loaded:
-    if not should_query and (not st.session_state.last_stats["top_devices"].empty):
-        # Show last result with info message
-        st.info("💡 Adjust filters and click 'Apply Filters & Refresh' to update the dashboard.")
-    elif should_query:
-        st.warning("No data found for the selected filters.")
-        st.stop()
-    else:
-        st.info("👆 Select filters and click 'Apply Filters & Refresh' to load data.")
-        st.stop()
-else:
-    # Show success message with filter info
-    active_filters = sum([
-        selected_region is not None,
-        selected_vertical is not None,
-        selected_organization is not None,
-        selected_industry is not None,
-        selected_vendor is not None,
-        selected_device_category is not None,
-        selected_device_type_family is not None,
-        selected_device_subcategory is not None,
-        selected_model is not None,
-        selected_os_name is not None,
-        selected_mac_oui is not None
-    ])
+@st.fragment
+def render_dashboard(filters: Dict[str, Optional[str]]) -> None:
+    """Render the Global, Risk and Vulnerabilities tabs for the applied filters.
     
-    record_count_msg = "Dashboard data successfully loaded"
-    if active_filters == 0:
-        st.success(f"{record_count_msg} (All filters: showing all data)")
-    else:
-        st.success(f"{record_count_msg} ({active_filters} filter{'s' if active_filters > 1 else ''} applied)")
+    Runs as a fragment so buttons inside the tabs (e.g. UID examples) only rerun
+    the dashboard body; applying filters still reruns the whole app.
+    """
+    # Get current stats (either newly fetched or from last run)
+    stats = st.session_state.last_stats
+    df_top = stats.get("top_devices", pd.DataFrame())
+    df_sub = stats.get("subcategory", pd.DataFrame())
+    df_cat = stats.get("category", pd.DataFrame())
+    df_os = stats.get("os_dist", pd.DataFrame())
+    df_vendor = stats.get("vendor_dist", pd.DataFrame())
+    df_dtype_counts = stats.get("top_device_type_family", pd.DataFrame())
+    df_vendor_counts = stats.get("top_vendor", pd.DataFrame())
+    total_devices = stats.get("total_devices", 0)
+    df_sources = stats.get("source_coverage", pd.DataFrame())
+    df_org_dist = stats.get("org_dist", pd.DataFrame())
+    df_risk = stats.get("risk_dist", pd.DataFrame())
+    df_critical = stats.get("risk_critical", pd.DataFrame())
+    df_high = stats.get("risk_high", pd.DataFrame())
+    df_medium = stats.get("risk_medium", pd.DataFrame())
+    # Note: Vulnerability data is loaded on demand in the Vulnerabilities tab
     
     # Create Tabs
     tab_global, tab_risk, tab_vuln = st.tabs(["Global", "Risk", "Vulnerabilities"])
@@ -944,34 +990,14 @@ else:
         with col1:
             st.subheader("Device Category Distribution")
             if not df_cat.empty:
-                fig = go.Figure(data=[go.Pie(
-                    labels=df_cat['device_category'].tolist(),
-                    values=df_cat['count'].tolist(),
-                    hole=0.3
-                )])
-                fig.update_layout(
-                    height=400,
-                    showlegend=True,
-                    margin=dict(l=20, r=20, t=30, b=20)
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(build_pie_figure(df_cat, 'device_category'), use_container_width=True)
             else:
                 st.info("No category data available.")
     
         with col2:
             st.subheader("Device Subcategory Distribution")
             if not df_sub.empty:
-                fig = go.Figure(data=[go.Pie(
-                    labels=df_sub['device_subcategory'].tolist(),
-                    values=df_sub['count'].tolist(),
-                    hole=0.3
-                )])
-                fig.update_layout(
-                    height=400,
-                    showlegend=True,
-                    margin=dict(l=20, r=20, t=30, b=20)
-                )
-                st.plotly_chart(fig, use_container_width=True)
+                st.plotly_chart(build_pie_figure(df_sub, 'device_subcategory'), use_container_width=True)
             else:
                 st.info("No subcategory data available.")
         
@@ -979,40 +1005,7 @@ else:
         st.divider()
         st.subheader("Data Sources Percentages")
         if not df_sources.empty and total_devices > 0:
-            # Calculate percentage of devices that have each source
-            df_sources_display = df_sources.copy()
-            df_sources_display['percentage'] = (df_sources_display['device_count'] / total_devices * 100).round(1)
-            
-            # Sort by percentage descending
-            df_sources_display = df_sources_display.sort_values('percentage', ascending=True)
-            
-            # Assign distinct colors to each bar (softer rainbow)
-            num_sources = len(df_sources_display)
-            colors = [
-                f'hsl({int(i * 360 / num_sources)}, 55%, 45%)' 
-                for i in range(num_sources)
-            ]
-            
-            fig_sources = go.Figure(go.Bar(
-                x=df_sources_display['percentage'],
-                y=df_sources_display['source'],
-                orientation='h',
-                text=[f"{p}% ({c:,} devices)" for p, c in zip(df_sources_display['percentage'], df_sources_display['device_count'])],
-                textposition='auto',
-                marker=dict(
-                    color=colors,
-                    line=dict(color='white', width=1)
-                )
-            ))
-            fig_sources.update_layout(
-                xaxis_title="% of Devices",
-                yaxis_title="",
-                height=max(300, len(df_sources_display) * 50),  # Dynamic height based on number of sources
-                margin=dict(l=0, r=0, t=20, b=40),
-                xaxis=dict(range=[0, 105]),  # Allow some room for 100%+ labels
-                yaxis=dict(tickfont=dict(size=14))  # Larger font for source labels
-            )
-            st.plotly_chart(fig_sources, use_container_width=True)
+            st.plotly_chart(build_sources_figure(df_sources, total_devices), use_container_width=True)
         else:
             st.info("No source data available.")
         
@@ -1020,60 +1013,7 @@ else:
         st.divider()
         st.subheader("OS Distribution")
         if not df_os.empty:
-            
-            # Prepare data for spiral layout
-            df_bubble = df_os.copy()
-            df_bubble = df_bubble.sort_values('count', ascending=False).reset_index(drop=True)
-            
-            # Calculate percentages
-            total_count = df_bubble['count'].sum()
-            df_bubble['percent'] = (df_bubble['count'] / total_count * 100).round(1)
-            
-            # Spiral Coordinates Algorithm
-            # This places the largest bubble in center (0,0) and spirals others out
-            x_coords = []
-            y_coords = []
-            for i in range(len(df_bubble)):
-                angle = 2.4 * i  # Golden angle approximation (radians)
-                radius = 7 * math.sqrt(i)  # Spread factor
-                x_coords.append(radius * math.cos(angle))
-                y_coords.append(radius * math.sin(angle))
-            
-            # Boost small sizes for visibility (Logarithmic-like scaling for visualization)
-            # This ensures small counts are visible bubbles, while large ones are still dominant
-            # We use a base size + scaled count
-            base_size = df_bubble['count'].max() * 0.05
-            visual_sizes = df_bubble['count'] + base_size
-            
-            fig_bubble = go.Figure(go.Scatter(
-                x=x_coords,
-                y=y_coords,
-                mode='markers+text',
-                marker=dict(
-                    size=visual_sizes,
-                    sizemode='area',
-                    # Larger sizeref = smaller bubbles. We lower it to make bubbles bigger.
-                    sizeref=2.0 * visual_sizes.max() / (120**2), 
-                    color=df_bubble.index, # Use Index (Integers) for colorscale
-                    colorscale='Turbo', # Vibrant, varied scale
-                    showscale=False
-                ),
-                text=[f"{row['os_name']}<br>{row['percent']}%" for _, row in df_bubble.iterrows()],
-                textposition="middle center",
-                textfont=dict(color='white', size=10, weight='bold'), # Ensure text is readable
-                hoverinfo='text',
-                hovertext=[f"{row['os_name']}: {row['count']} ({row['percent']}%)" for _, row in df_bubble.iterrows()]
-            ))
-            
-            fig_bubble.update_layout(
-                xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                height=600,
-                margin=dict(l=0, r=0, t=20, b=0),
-                plot_bgcolor='rgba(0,0,0,0)'
-            )
-            st.plotly_chart(fig_bubble, use_container_width=True)
-            
+            st.plotly_chart(build_os_bubble_figure(df_os), use_container_width=True)
         else:
             st.info("No OS data available.")
 
@@ -1083,11 +1023,7 @@ else:
         
         if not df_top.empty:
             # Filter for rows where all three fields are not null
-            df_top_filtered = df_top[
-                df_top['vendor'].notna() & 
-                df_top['device_type_family'].notna() & 
-                df_top['model'].notna()
-            ].head(1000)
+            df_top_filtered = df_top.dropna(subset=['vendor', 'device_type_family', 'model']).head(1000)
             
             if not df_top_filtered.empty:
                 st.dataframe(
@@ -1098,18 +1034,7 @@ else:
             else:
                 st.info("No data available with all three fields populated.")
             
-            # Create aggregated tables for Device Type Family and Vendor
-            # Device Type Family counts (filter only where device_type_family is not null)
-            df_dtype_counts = df_top[df_top['device_type_family'].notna()].groupby('device_type_family')['count'].sum().reset_index()
-            df_dtype_counts = df_dtype_counts.sort_values('count', ascending=False).head(100)
-            df_dtype_counts.columns = ['device_type_family', 'count']
-            
-            # Vendor counts (filter only where vendor is not null)
-            df_vendor_counts = df_top[df_top['vendor'].notna()].groupby('vendor')['count'].sum().reset_index()
-            df_vendor_counts = df_vendor_counts.sort_values('count', ascending=False).head(100)
-            df_vendor_counts.columns = ['vendor', 'count']
-            
-            # Display two tables side by side
+            # Display two tables side by side (aggregated over all devices in get_global_stats)
             st.divider()
             col_dtype, col_vendor = st.columns(2)
             
@@ -1134,17 +1059,10 @@ else:
         st.subheader("Top 20 Vendors Distribution")
         
         if not df_vendor.empty:
-            fig_vendor = go.Figure(data=[go.Pie(
-                labels=df_vendor['vendor'].tolist(),
-                values=df_vendor['count'].tolist(),
-                hole=0.4
-            )])
-            fig_vendor.update_layout(
-                height=500,
-                showlegend=True,
-                margin=dict(t=0, b=0, l=0, r=0)
+            st.plotly_chart(
+                build_pie_figure(df_vendor, 'vendor', hole=0.4, height=500, margin=(0, 0, 0, 0)),
+                use_container_width=True
             )
-            st.plotly_chart(fig_vendor, use_container_width=True)
         else:
             st.info("No vendor data available.")
         
@@ -1153,51 +1071,17 @@ else:
         st.subheader("Top 20 Organizations")
         
         if not df_org_dist.empty:
-            # Get top 20 for display
-            df_org_top20 = df_org_dist.head(20).copy()
-            df_org_top20 = df_org_top20.sort_values('count', ascending=True)  # For horizontal chart
-            
-            # Create lollipop chart (scatter + line segments)
-            fig_lollipop = go.Figure()
-            
-            # Add lines (stems)
-            for i, row in df_org_top20.iterrows():
-                fig_lollipop.add_trace(go.Scatter(
-                    x=[0, row['count']],
-                    y=[row['organization'], row['organization']],
-                    mode='lines',
-                    line=dict(color='#3f51b5', width=2),
-                    showlegend=False,
-                    hoverinfo='skip'
-                ))
-            
-            # Add dots (lollipop heads)
-            fig_lollipop.add_trace(go.Scatter(
-                x=df_org_top20['count'],
-                y=df_org_top20['organization'],
-                mode='markers+text',
-                marker=dict(size=12, color='#3f51b5'),
-                text=df_org_top20['count'].apply(lambda x: f'{x:,}'),
-                textposition='middle right',
-                textfont=dict(size=11),
-                showlegend=False,
-                hovertemplate='%{y}<br>Count: %{x:,}<extra></extra>'
-            ))
-            
-            fig_lollipop.update_layout(
-                height=max(400, len(df_org_top20) * 30),
-                margin=dict(l=0, r=60, t=20, b=40),
-                xaxis_title="Device Count",
-                yaxis_title="",
-                yaxis=dict(tickfont=dict(size=12)),
-                plot_bgcolor='rgba(0,0,0,0)'
+            # Static render: no hover/zoom handlers for the 20 labelled markers
+            st.plotly_chart(
+                build_lollipop_figure(df_org_dist),
+                use_container_width=True,
+                config={'staticPlot': True, 'displayModeBar': False}
             )
-            st.plotly_chart(fig_lollipop, use_container_width=True)
             
             # CSV Download for all organizations
             st.download_button(
                 label="📥 Download All Organizations (CSV)",
-                data=df_org_dist.to_csv(index=False),
+                data=dataframe_to_csv(df_org_dist),
                 file_name="organizations_device_count.csv",
                 mime="text/csv"
             )
@@ -1205,7 +1089,7 @@ else:
             st.info("No organization data available.")
         
         # UID Examples Section - Only shown when vendor or model filter is applied
-        if selected_vendor is not None or selected_model is not None:
+        if filters['vendor'] is not None or filters['model'] is not None:
             st.divider()
             st.subheader("🔍 UID Examples (Best Classification)")
             st.caption("Shows devices with the most complete classification data (vendor, model, device_type_family, serial_number, sw_version, hw_version, product_code)")
@@ -1217,25 +1101,12 @@ else:
                 st.session_state.uid_examples_filters = None
             
             # Current filter signature to detect changes
-            current_filter_sig = f"{selected_vendor}_{selected_model}_{selected_region}_{selected_organization}"
+            current_filter_sig = f"{filters['vendor']}_{filters['model']}_{filters['region']}_{filters['organization']}"
             
             # Button to fetch examples
             if st.button("📋 Get UID Examples", key="get_uid_examples"):
                 with st.spinner("Fetching best classified device examples..."):
-                    df_examples = get_uid_examples(
-                        region=selected_region,
-                        vertical=selected_vertical,
-                        organization=selected_organization,
-                        industry=selected_industry,
-                        account_status=selected_account_status,
-                        vendor=selected_vendor,
-                        device_category=selected_device_category,
-                        device_type_family=selected_device_type_family,
-                        device_subcategory=selected_device_subcategory,
-                        model=selected_model,
-                        os_name=selected_os_name,
-                        mac_oui=selected_mac_oui
-                    )
+                    df_examples = get_uid_examples(**filters)
                     st.session_state.uid_examples = df_examples
                     st.session_state.uid_examples_filters = current_filter_sig
             
@@ -1257,7 +1128,7 @@ else:
                 # CSV Download
                 st.download_button(
                     label="📥 Download UID Examples (CSV)",
-                    data=df_display.to_csv(index=False),
+                    data=dataframe_to_csv(df_display),
                     file_name="uid_examples.csv",
                     mime="text/csv",
                     key="download_uid_examples"
@@ -1277,20 +1148,8 @@ else:
                 'Low': '#00FF00',       # Green
                 'None': '#808080'       # Grey
             }
-            colors = [risk_colors.get(x, '#808080') for x in df_risk['risk_score']]
-            
-            fig = go.Figure(data=[go.Pie(
-                labels=df_risk['risk_score'].tolist(),
-                values=df_risk['count'].tolist(),
-                hole=0.3,
-                marker=dict(colors=colors)
-            )])
-            fig.update_layout(
-                height=400,
-                showlegend=True,
-                margin=dict(l=20, r=20, t=30, b=20)
-            )
-            st.plotly_chart(fig, use_container_width=True)
+            colors = tuple(risk_colors.get(x, '#808080') for x in df_risk['risk_score'])
+            st.plotly_chart(build_pie_figure(df_risk, 'risk_score', colors=colors), use_container_width=True)
         else:
             st.info("No risk score data available.")
         
@@ -1318,53 +1177,249 @@ else:
     with tab_vuln:
         st.subheader("Vulnerability Analysis")
         
-        # Lazy load vulnerability data when tab is viewed
-        if st.session_state.vuln_needs_refresh:
-            with st.spinner("Loading Vulnerability data..."):
-                stats_vuln = get_vulnerability_stats(
-                    region=selected_region,
-                    vertical=selected_vertical,
-                    organization=selected_organization,
-                    industry=selected_industry,
-                    account_status=selected_account_status,
-                    vendor=selected_vendor,
-                    device_category=selected_device_category,
-                    device_type_family=selected_device_type_family,
-                    device_subcategory=selected_device_subcategory,
-                    model=selected_model,
-                    os_name=selected_os_name,
-                    mac_oui=selected_mac_oui
-                )
-                st.session_state.last_stats.update(stats_vuln)
-                st.session_state.vuln_needs_refresh = False
-        
-        # Get vulnerability data from session state
-        df_vuln_confirmed = st.session_state.last_stats.get("vuln_confirmed", pd.DataFrame())
-        df_vuln_potential = st.session_state.last_stats.get("vuln_potential", pd.DataFrame())
-        vuln_confirmed_total = st.session_state.last_stats.get("vuln_confirmed_total", 0)
-        vuln_potential_total = st.session_state.last_stats.get("vuln_potential_total", 0)
-        
-        # Counters at the top
-        col_confirmed, col_potential = st.columns(2)
-        with col_confirmed:
-            st.metric(label="🔴 Confirmed", value=f"{vuln_confirmed_total:,}")
-        with col_potential:
-            st.metric(label="🟡 Potentially Relevant", value=f"{vuln_potential_total:,}")
-        
-        st.divider()
-        
-        # Confirmed Vulnerabilities Table
-        st.markdown("### 🔴 Confirmed Vulnerabilities")
-        if not df_vuln_confirmed.empty:
-            st.dataframe(df_vuln_confirmed, use_container_width=True, hide_index=True)
-        else:
-            st.info("No Confirmed vulnerabilities found.")
-        
-        st.divider()
+        # st.tabs renders every panel on each run, so only query once the user asks for it.
+        # After that, keep following the applied filters (cached per filter combination).
+        if not st.session_state.get("vuln_loaded", False):
+            st.session_state.vuln_loaded = st.button("Load vulnerability data", key="load_vuln")
         
-        # Potentially Relevant Vulnerabilities Table
-        st.markdown("### 🟡 Potentially Relevant Vulnerabilities")
-        if not df_vuln_potential.empty:
-            st.dataframe(df_vuln_potential, use_container_width=True, hide_index=True)
+        if not st.session_state.vuln_loaded:
+            st.info("Vulnerability data is loaded on demand. Click 'Load vulnerability data' to fetch it.")
         else:
-            st.info("No Potentially Relevant vulnerabilities found.")
\ No newline at end of file
+            with st.spinner("Loading Vulnerability data..."):
+                stats_vuln = get_vulnerability_stats(**filters)
+            df_vuln_confirmed = stats_vuln["vuln_confirmed"]
+            df_vuln_potential = stats_vuln["vuln_potential"]
+            vuln_confirmed_total = stats_vuln["vuln_confirmed_total"]
+            vuln_potential_total = stats_vuln["vuln_potential_total"]
+            
+            # Counters at the top
+            col_confirmed, col_potential = st.columns(2)
+            with col_confirmed:
+                st.metric(label="🔴 Confirmed", value=f"{vuln_confirmed_total:,}")
+            with col_potential:
+                st.metric(label="🟡 Potentially Relevant", value=f"{vuln_potential_total:,}")
+            
+            st.divider()
+            
+            # Confirmed Vulnerabilities Table
+            st.markdown("### 🔴 Confirmed Vulnerabilities")
+            if not df_vuln_confirmed.empty:
+                st.dataframe(df_vuln_confirmed, use_container_width=True, hide_index=True)
+            else:
+                st.info("No Confirmed vulnerabilities found.")
+            
+            st.divider()
+            
+            # Potentially Relevant Vulnerabilities Table
+            st.markdown("### 🟡 Potentially Relevant Vulnerabilities")
+            if not df_vuln_potential.empty:
+                st.dataframe(df_vuln_potential, use_container_width=True, hide_index=True)
+            else:
+                st.info("No Potentially Relevant vulnerabilities found.")
+
+# Sidebar filters
+st.sidebar.header("Filters")
+
+# Create a placeholder for filter errors that we can clear later
+filter_error_container = st.sidebar.empty()
+
+# Get filter options
+filter_options_result = get_filter_options(cache_date=date.today().isoformat())
+if filter_options_result is None or not any(filter_options_result.values()):
+    # Don't keep a failed or empty result in the (persisted) cache; a single empty
+    # column (e.g. no MAC OUIs) is a legitimate result and stays cached
+    get_filter_options.clear()
+
+if filter_options_result is None:
+    # Show error if failed
+    filter_error_container.error("⚠️ Filter options failed to load. Using defaults.")
+    filter_options = {key: [] for key in [
+        'region', 'vertical', 'organization', 'industry', 
+        'vendor', 'device_category', 'device_type_family', 
+        'device_subcategory', 'model', 'os_name', 'mac_oui'
+    ]}
+else:
+    # Clear any previous error if successful
+    filter_error_container.empty()
+    filter_options = filter_options_result
+
+# Use a form to batch filter changes - form only triggers rerun on submit
+with st.sidebar.form("filters_form"):
+    # Submit button at the top
+    submitted = st.form_submit_button("🔄 Apply Filters & Refresh", use_container_width=True)
+    
+    st.subheader("Organization Filters")
+    # Create filter dropdowns inside the form
+    selected_region = st.selectbox(
+        "Region",
+        options=[None] + filter_options.get('region', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_vertical = st.selectbox(
+        "Vertical",
+        options=[None] + filter_options.get('vertical', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_organization = st.selectbox(
+        "Organization",
+        options=[None] + filter_options.get('organization', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_industry = st.selectbox(
+        "Industry",
+        options=[None] + filter_options.get('industry', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_account_status = st.selectbox(
+        "Account Status",
+        options=[None] + filter_options.get('account_status', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    st.markdown("---")
+    st.subheader("Device Filters")
+    
+    selected_device_category = st.selectbox(
+        "Device Category",
+        options=[None] + filter_options.get('device_category', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_device_subcategory = st.selectbox(
+        "Device Subcategory",
+        options=[None] + filter_options.get('device_subcategory', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_device_type_family = st.selectbox(
+        "Device Type Family",
+        options=[None] + filter_options.get('device_type_family', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_vendor = st.selectbox(
+        "Vendor",
+        options=[None] + filter_options.get('vendor', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_model = st.selectbox(
+        "Model",
+        options=[None] + filter_options.get('model', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_os_name = st.selectbox(
+        "OS Name",
+        options=[None] + filter_options.get('os_name', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+    
+    selected_mac_oui = st.selectbox(
+        "MAC OUI",
+        options=[None] + filter_options.get('mac_oui', []),
+        format_func=lambda x: "All" if x is None else x
+    )
+
+# Initialize session state to store last query result
+if 'last_stats' not in st.session_state:
+    st.session_state.last_stats = {
+        "top_devices": pd.DataFrame(), 
+        "subcategory": pd.DataFrame(),
+        "category": pd.DataFrame(),
+        "os_dist": pd.DataFrame(),
+        "vendor_dist": pd.DataFrame(),
+        "top_device_type_family": pd.DataFrame(),
+        "top_vendor": pd.DataFrame(),
+        "total_devices": 0,
+        "source_coverage": pd.DataFrame(),
+        "org_dist": pd.DataFrame(),
+        "risk_dist": pd.DataFrame(),
+        "risk_critical": pd.DataFrame(),
+        "risk_high": pd.DataFrame(),
+        "risk_medium": pd.DataFrame()
+    }
+if 'last_filters' not in st.session_state:
+    st.session_state.last_filters = {}
+if 'initial_load_done' not in st.session_state:
+    st.session_state.initial_load_done = False
+
+# All 12 filter selections as stat function kwargs, built once and reused for every call
+filter_kwargs = dict(
+    region=selected_region,
+    vertical=selected_vertical,
+    organization=selected_organization,
+    industry=selected_industry,
+    account_status=selected_account_status,
+    vendor=selected_vendor,
+    device_category=selected_device_category,
+    device_type_family=selected_device_type_family,
+    device_subcategory=selected_device_subcategory,
+    model=selected_model,
+    os_name=selected_os_name,
+    mac_oui=selected_mac_oui
+)
+selected_values = tuple(filter_kwargs.values())
+
+# Auto-load on first run when all filters are "All" (None)
+all_filters_all = not any(value is not None for value in selected_values)
+
+# Query on form submit OR on initial load when all filters are "All"
+should_query = submitted or (not st.session_state.initial_load_done and all_filters_all)
+
+if should_query:
+    # Submitting the same filters again (e.g. a double-click on Apply) reuses last_stats
+    # without even paying the stat functions' cache-key hashing
+    filters_unchanged = (
+        st.session_state.initial_load_done
+        and st.session_state.get('last_filter_key') == selected_values
+    )
+    st.session_state.last_filters = filter_kwargs
+    st.session_state.last_filter_key = selected_values
+    
+    # Mark initial load as done
+    if not st.session_state.initial_load_done:
+        st.session_state.initial_load_done = True
+    
+    if not filters_unchanged:
+        # Global and Risk share one fused aggregate query (the Risk call is a run_query
+        # cache hit) and Global already runs its two queries concurrently, so one
+        # spinner covers both
+        with st.spinner("Loading dashboard data..."):
+            stats_global = get_global_stats(**filter_kwargs)
+            stats_risk = get_risk_stats(**filter_kwargs)
+            st.session_state.last_stats.update(stats_global)
+            st.session_state.last_stats.update(stats_risk)
+
+# Get current stats (either newly fetched or from last run)
+stats = st.session_state.last_stats
+
+# Show data status (based on Global stats); each .empty is evaluated once
+empties = {key: stats[key].empty for key in ("top_devices", "subcategory", "category")}
+data_loaded = not all(empties.values())
+
+if not data_loaded:
+    if not should_query and not empties["top_devices"]:
+        # Show last result with info message
+        st.info("💡 Adjust filters and click 'Apply Filters & Refresh' to update the dashboard.")
+    elif should_query:
+        st.warning("No data found for the selected filters.")
+        st.stop()
+    else:
+        st.info("👆 Select filters and click 'Apply Filters & Refresh' to load data.")
+        st.stop()
+else:
+    # Show success message with filter info
+    active_filters = sum(value is not None for value in selected_values)
+    
+    record_count_msg = "Dashboard data successfully loaded"
+    if active_filters == 0:
+        st.success(f"{record_count_msg} (All filters: showing all data)")
+    else:
+        st.success(f"{record_count_msg} ({active_filters} filter{'s' if active_filters > 1 else ''} applied)")
+    
+    render_dashboard(st.session_state.last_filters)